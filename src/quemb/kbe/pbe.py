@@ -21,7 +21,7 @@ from quemb.kbe.misc import print_energy, storePBE
 from quemb.kbe.pfrag import Frags
 from quemb.molbe.be_parallel import be_func_parallel
 from quemb.molbe.helper import get_eri, get_scfObj, get_veff
-from quemb.molbe.opt import BEOPT
+from quemb.molbe.opt import BEOPT, check_opt_method
 from quemb.molbe.solver import Solvers, UserSolverArgs, be_func
 from quemb.shared.external.optqn import (
     get_be_error_jacobian as _ext_get_be_error_jacobian,
@@ -298,7 +298,7 @@ class BE(Mixin_k_Localize):
         nproc: int = 1,
         ompnum: int = 4,
         max_iter: int = 500,
-        jac_solver: Literal["HF", "MP2", "CCSD"] = "HF",
+        jac_solver: Literal["HF", "MP2", "CCSD", "FD"] = "HF",
         trust_region: bool = False,
     ) -> None:
         """BE optimization function
@@ -310,7 +310,8 @@ class BE(Mixin_k_Localize):
         solver : str, optional
             High-level solver for the fragment, by default 'CCSD'
         method : str, optional
-            Optimization method, by default 'QN'
+            Optimization method, by default 'QN'.
+            'LBFGS' selects the limited-memory BFGS variant
         only_chem : bool, optional
             If true, density matching is not performed --
             only global chemical potential is optimized, by default False
@@ -334,11 +335,18 @@ class BE(Mixin_k_Localize):
             Defaults to 4
         jac_solver :
             Method to form Jacobian used in optimization routine, by default HF.
-            Options include HF, MP2, CCSD
+            Options include HF, MP2, CCSD, and FD (finite differences of the
+            high-level solver, evaluated in parallel if nproc > 1).
+            FD is only supported for method 'QN'.
         trust_region :
-            Use trust-region based QN optimization, by default False
+            Use trust-region based QN optimization, by default False.
+            Only supported for method 'QN'.
 
         """
+        check_opt_method(method)
+        if jac_solver == "FD" and method == "LBFGS":
+            raise ValueError("jac_solver='FD' is only supported for method='QN'")
+
         # Check if only chemical potential optimization is required
         if not only_chem:
             pot = self.pot
@@ -367,32 +375,32 @@ class BE(Mixin_k_Localize):
             ebe_hf=self.ebe_hf,
         )
 
-        if method == "QN":
-            # Prepare the initial Jacobian matrix
-            if only_chem:
-                J0 = array([[0.0]])
-                J0 = self.get_be_error_jacobian(jac_solver=jac_solver)
-                J0 = J0[-1:, -1:]
-            else:
-                J0 = self.get_be_error_jacobian(jac_solver=jac_solver)
-
-            # Perform the optimization
-            be_.optimize(method, J0=J0, trust_region=trust_region)
-            self.ebe_tot = self.ebe_hf + be_.Ebe[0]
-            # Print the energy components
-            if use_cumulant:
-                print_energy(
-                    be_.Ebe[0],
-                    be_.Ebe[1][1],
-                    be_.Ebe[1][0] + be_.Ebe[1][2],
-                    self.ebe_hf,
-                    self.unitcell_nkpt,
-                )
-            else:
-                raise NotImplementedError("""Non-cumulant energy not yet supported
-                                               for periodic code""")
+        # Prepare the initial Jacobian matrix
+        if jac_solver == "FD":
+            # Built from finite differences inside BEOPT
+            J0 = None
+        elif only_chem:
+            J0 = array([[0.0]])
+            J0 = self.get_be_error_jacobian(jac_solver=jac_solver)
+            J0 = J0[-1:, -1:]
         else:
-            raise ValueError("This optimization method for BE is not supported")
+            J0 = self.get_be_error_jacobian(jac_solver=jac_solver)
+
+        # Perform the optimization
+        be_.optimize(method, J0=J0, trust_region=trust_region)
+        self.ebe_tot = self.ebe_hf + be_.Ebe[0]
+        # Print the energy components
+        if use_cumulant:
+            print_energy(
+                be_.Ebe[0],
+                be_.Ebe[1][1],
+                be_.Ebe[1][0] + be_.Ebe[1][2],
+                self.ebe_hf,
+                self.unitcell_nkpt,
+            )
+        else:
+            raise NotImplementedError("""Non-cumulant energy not yet supported
+                                               for periodic code""")
 
     def save(self, restart_file: PathLike = "storebe.pk") -> None:
         """
@@ -10,6 +10,7 @@ from numpy import (
     diag_indices,
     einsum,
     float64,
+    int64,
     outer,
     result_type,
     trace,
@@ -129,6 +130,10 @@ class Frags:
         self.genvs = None
         self.ebe = 0.0
         self.ebe_hf = 0.0
+        # [e1, e2, ec] of the last high-level solve
+        self.e_f: list[float] | None = None
+        # index arrays of the density matching, see quemb.molbe.solver.solve_error
+        self._matching_idx: tuple[Matrix[int64], Matrix[int64]] | None = None
         self.fock: Matrix[float64]
         self.veff = None
         self.veff0 = None
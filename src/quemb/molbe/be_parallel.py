@@ -1,13 +1,16 @@
 # Author(s): Oinam Romesh Meitei, Leah Weisburn
 
 import os
+from collections.abc import Iterable, Sequence
+from concurrent.futures import ProcessPoolExecutor
 from multiprocessing import Pool
+from multiprocessing.sharedctypes import Synchronized
 from pathlib import Path
 from warnings import warn
 
 from numpy import diag_indices, einsum, float64, zeros_like
 from numpy.linalg import multi_dot
-from pyscf import ao2mo, fci, mcscf
+from pyscf import ao2mo, fci, lib, mcscf
 
 from quemb.kbe.pfrag import Frags as pFrags
 from quemb.molbe.helper import (
@@ -22,6 +25,7 @@ from quemb.molbe.solver import (
     Solvers,
     UserSolverArgs,
     _SHCI_Args,
+    be_func,
     solve_ccsd,
     solve_error,
     solve_mp2,
@@ -34,8 +38,168 @@ from quemb.shared.typing import (
     ListOverFrag,
     Matrix,
     RelAOIdx,
+    Vector,
 )
 
+# Fragments of the parent process, inherited by the workers of a persistent pool.
+# Set once per worker by :func:`init_worker`.
+_worker_Fobjs: list[Frags] | list[pFrags] | None = None
+# Scratch directories private to a worker, created by :func:`be_func_in_worker`.
+_worker_scratch_dir: WorkDir | None = None
+_worker_frag_scratch_dirs: list[WorkDir] | None = None
+
+
+def init_worker(
+    Fobjs: list[Frags] | list[pFrags],
+    ompnum: int,
+    worker_counter: "Synchronized[int] | None" = None,
+) -> None:
+    """Initializer for a persistent :class:`ProcessPoolExecutor`.
+
+    The pool is expected to use the :python:`"fork"` start method,
+    so that :python:`Fobjs` is inherited by, instead of pickled to, the workers.
+    On later calls only the potentials and fragment indices are sent.
+
+    Parameters
+    ----------
+    Fobjs :
+        Fragment definitions.
+    ompnum :
+        Number of OpenMP threads per worker.
+    worker_counter :
+        Shared counter, starting at 0, that numbers the workers.
+        If given and :python:`ompnum > 1`, each worker is pinned to its own
+        contiguous slice of :python:`ompnum` of the available cores.
+    """
+    global _worker_Fobjs  # noqa: PLW0603
+    if worker_counter is not None and ompnum > 1:
+        with worker_counter.get_lock():
+            worker_id = worker_counter.value
+            worker_counter.value += 1
+        _pin_to_cores(worker_id, ompnum)
+    _set_num_threads(ompnum)
+    _worker_Fobjs = Fobjs
+
+
+def _set_num_threads(ompnum: int) -> None:
+    """Set the number of OpenMP threads of the current (worker) process."""
+    os.environ["OMP_NUM_THREADS"] = str(ompnum)
+    lib.num_threads(ompnum)
+
+
+def _pin_to_cores(worker_id: int, ompnum: int) -> None:
+    """Bind the current process to the cores
+    :python:`worker_id * ompnum, ..., (worker_id + 1) * ompnum - 1`
+    of the available ones.
+
+    Only the CPU affinity of the process is set; the OpenMP threads it starts
+    inherit it. The OpenMP runtime was already initialized in the parent,
+    so the threads are not bound to individual cores.
+    Nothing is done if the platform does not support it,
+    or if there are not enough cores for this worker.
+    """
+    if not hasattr(os, "sched_setaffinity"):
+        return
+    cores = _get_worker_cores(worker_id, ompnum, os.sched_getaffinity(0))
+    if cores is not None:
+        os.sched_setaffinity(0, cores)
+
+
+def _get_worker_cores(
+    worker_id: int, ompnum: int, available: Iterable[int]
+) -> list[int] | None:
+    """The :python:`ompnum` cores of worker :python:`worker_id`
+    among the :python:`available` ones, or None if there are not enough."""
+    cores = sorted(available)
+    if (worker_id + 1) * ompnum > len(cores):
+        return None
+    return cores[worker_id * ompnum : (worker_id + 1) * ompnum]
+
+
+def _run_solver_in_worker(
+    frag_idx,
+    pot,
+    only_chem,
+    solver,
+    scratch_dir,
+    eeval,
+    return_vec,
+    use_cumulant,
+    relax_density,
+    solver_args,
+    frag_scratch,
+):
+    """:func:`run_solver` for the worker's copy of fragment :python:`frag_idx`"""
+    assert _worker_Fobjs is not None
+    fobj = _worker_Fobjs[frag_idx]
+    if pot is not None:
+        fobj.update_heff(pot, only_chem=only_chem)
+    assert fobj.fock is not None and fobj.heff is not None and fobj.dm0 is not None
+    return run_solver(
+        fobj.fock + fobj.heff,
+        fobj.dm0.copy(),
+        scratch_dir,
+        fobj.dname,
+        fobj.nao,
+        fobj.nsocc,
+        fobj.n_frag,
+        fobj.weight_and_relAO_per_center,
+        fobj.TA,
+        fobj.h1,
+        solver,
+        fobj.eri_file,
+        fobj.veff if not use_cumulant else None,
+        fobj.veff0,
+        eeval,
+        return_vec,
+        use_cumulant,
+        relax_density,
+        solver_args,
+        frag_scratch,
+    )
+
+
+def be_func_in_worker(
+    pot: Vector[float64] | None,
+    scratch_dir: WorkDir,
+    frag_scratch_dirs: Sequence[WorkDir] | None = None,
+    fixed_rdm1s: dict[int, Matrix[float64]] | None = None,
+    **kwargs,
+):
+    """:func:`quemb.molbe.solver.be_func` for the worker's copy of the fragments
+
+    Solves the fragments serially; the remaining arguments are passed on.
+    Several workers may solve the same fragment at the same time,
+    so the solvers use a subdirectory of :python:`scratch_dir` private to this
+    worker instead of :python:`scratch_dir` and :python:`frag_scratch_dirs`.
+
+    Parameters
+    ----------
+    fixed_rdm1s :
+        1-RDMs of the fragments that are not solved, by fragment index,
+        i.e. those skipped by :python:`fragment_mask`.
+    """
+    global _worker_scratch_dir, _worker_frag_scratch_dirs  # noqa: PLW0603
+    assert _worker_Fobjs is not None
+    if _worker_scratch_dir is None:
+        _worker_scratch_dir = scratch_dir.make_subdir(f"worker_{os.getpid()}")
+    if frag_scratch_dirs is not None and _worker_frag_scratch_dirs is None:
+        _worker_frag_scratch_dirs = [
+            _worker_scratch_dir.make_subdir(fobj.dname) for fobj in _worker_Fobjs
+        ]
+    if fixed_rdm1s is not None:
+        for frag_idx, rdm1 in fixed_rdm1s.items():
+            _worker_Fobjs[frag_idx]._rdm1 = rdm1
+    return be_func(
+        pot,
+        _worker_Fobjs,
+        scratch_dir=_worker_scratch_dir,
+        frag_scratch_dirs=(
+            None if frag_scratch_dirs is None else _worker_frag_scratch_dirs
+        ),
+        **kwargs,
+    )
+
 
 def run_solver(
     h1: Matrix[float64],
@@ -57,6 +221,7 @@ def run_solver(
     use_cumulant: bool = True,
     relax_density: bool = False,
     solver_args: UserSolverArgs | None = None,
+    frag_scratch: WorkDir | None = None,
 ):
     """
     Run a quantum chemistry solver to compute the reduced density matrices.
@@ -105,6 +270,9 @@ def run_solver(
         If True, return vector with error and rdms. Default is True.
     relax_density :
         If True, use CCSD relaxed density. Default is False
+    frag_scratch :
+        Scratch directory of the fragment for 'SCI'. If given, it is reused
+        instead of creating :code:`scratch_dir / dname`.
 
     Returns
     -------
@@ -239,7 +407,7 @@ def run_solver(
                 frag_name = Path(f"{scratch_dir}-frag_data") / f"{dname}_iter{iter}"
             frag_scratch = WorkDir(frag_name, cleanup_at_end=False)
             print("Fragment Scratch Directory:", frag_scratch)
-        else:
+        elif frag_scratch is None:
             frag_scratch = WorkDir(scratch_dir / dname)
         ci = cornell_shci.SHCI()
         ci.runtimedir = frag_scratch
@@ -297,6 +465,9 @@ def run_solver(
             use_cumulant,
             eri_file,
         )
+    else:
+        # Only the rdm1 is needed for the error vector.
+        e_f, rdm2s = None, None
     if eeval and not ret_vec:
         return e_f
 
@@ -407,10 +578,10 @@ def run_solver_u(
 
 
 def be_func_parallel(
-    pot: list[float] | None,
+    pot: Vector[float64] | None,
     Fobjs: list[Frags] | list[pFrags],
     Nocc: int,
-    solver: str,
+    solver: Solvers,
     enuc: float,  # noqa: ARG001
     scratch_dir: WorkDir,
     solver_args: UserSolverArgs | None,
@@ -421,6 +592,9 @@ def be_func_parallel(
     use_cumulant: bool = True,
     eeval: bool = False,
     return_vec: bool = False,
+    pool: ProcessPoolExecutor | None = None,
+    fragment_mask: Sequence[bool] | None = None,
+    frag_scratch_dirs: Sequence[WorkDir] | None = None,
 ):
     """
     Embarrassingly Parallel High-Level Computation
@@ -434,7 +608,8 @@ def be_func_parallel(
     ----------
     pot :
         Potentials (local & global) that are added to the 1-electron Hamiltonian
-        component.  The last element in the list is the chemical potential.
+        component.  The last element is the chemical potential.
+        Callers must pass a float64 :class:`numpy.ndarray` (or None).
     Fobjs :
         Fragment definitions.
     Nocc :
@@ -461,6 +636,18 @@ def be_func_parallel(
         Use cumulant energy expression. Defaults to True
     return_vec :
         Whether to return the error vector. Defaults to False.
+    pool :
+        Persistent pool that was initialized with :func:`init_worker` for
+        these :python:`Fobjs`. If given, only the potentials are sent to the
+        workers and :python:`nproc`, :python:`ompnum` are ignored.
+        Otherwise a new pool is created for this call.
+    fragment_mask :
+        Only solve the fragments for which this is True.
+        The other fragments keep their RDMs and energies from the previous call,
+        which is exact if their potentials did not change. Defaults to all True.
+    frag_scratch_dirs :
+        Scratch directory of each fragment for 'SCI'. If given, these are reused
+        instead of creating :code:`scratch_dir / dname` on every call.
 
     Returns
     -------
@@ -468,19 +655,52 @@ def be_func_parallel(
         Depending on the parameters, returns the error norm or a tuple containing
         the error norm, error vector, and the computed energy.
     """
-    # Set the number of OpenMP threads
-    os.system("export OMP_NUM_THREADS=" + str(ompnum))
-    nprocs = nproc // ompnum
-
     # Update the effective Hamiltonian with potentials
     if pot is not None:
         for fobj in Fobjs:
             fobj.update_heff(pot, only_chem=only_chem)
 
-    with Pool(nprocs) as pool_:
-        results = []  # type: ignore[var-annotated]
+    solve_idx = [
+        frag_idx
+        for frag_idx in range(len(Fobjs))
+        if fragment_mask is None or fragment_mask[frag_idx]
+    ]
+
+    if pool is not None:
+        futures = {
+            frag_idx: pool.submit(
+                _run_solver_in_worker,
+                frag_idx,
+                pot,
+                only_chem,
+                solver,
+                scratch_dir,
+                eeval,
+                return_vec,
+                use_cumulant,
+                relax_density,
+                solver_args,
+                None if frag_scratch_dirs is None else frag_scratch_dirs[frag_idx],
+            )
+            for frag_idx in solve_idx
+        }
+        return _collect_be_results(
+            {frag_idx: future.result() for frag_idx, future in futures.items()},
+            Fobjs,
+            Nocc,
+            only_chem,
+            return_vec,
+            eeval,
+        )
+
+    # Each worker uses ompnum OpenMP threads
+    with Pool(
+        max(1, nproc // ompnum), initializer=_set_num_threads, initargs=(ompnum,)
+    ) as pool_:
+        results = {}
         # Run solver in parallel for each fragment
-        for fobj in Fobjs:
+        for frag_idx in solve_idx:
+            fobj = Fobjs[frag_idx]
             assert (
                 fobj.fock is not None and fobj.heff is not None and fobj.dm0 is not None
             )
@@ -507,48 +727,56 @@ def be_func_parallel(
                     use_cumulant,
                     relax_density,
                     solver_args,
+                    None if frag_scratch_dirs is None else frag_scratch_dirs[frag_idx],
                 ],
             )
 
-            results.append(result)
+            results[frag_idx] = result
+
+        rdms = {frag_idx: result.get() for frag_idx, result in results.items()}
+
+    return _collect_be_results(rdms, Fobjs, Nocc, only_chem, return_vec, eeval)
+
 
-        rdms = [result.get() for result in results]
+def _collect_be_results(rdms, Fobjs, Nocc, only_chem, return_vec, eeval):
+    """Sum up fragment energies and store the solutions of :func:`run_solver`
+    on the fragments.
 
+    :python:`rdms` maps the index of each solved fragment to the output of
+    :func:`run_solver`; all other fragments keep their previous solution.
+    Without :python:`eeval`, no energies are returned."""
     if not return_vec:
-        # Compute and return fragment energy
         # rdms are the returned energies, not density matrices!
-        e_1 = 0.0
-        e_2 = 0.0
-        e_c = 0.0
-        for i in range(len(rdms)):
-            e_1 += rdms[i][0]
-            e_2 += rdms[i][1]
-            e_c += rdms[i][2]
-        return (e_1 + e_2 + e_c, (e_1, e_2, e_c))
+        for frag_idx, e_f in rdms.items():
+            Fobjs[frag_idx].e_f = e_f
+    else:
+        for frag_idx, rdm in rdms.items():
+            fobj = Fobjs[frag_idx]
+            fobj.e_f = rdm[0]
+            fobj.mo_coeffs = rdm[1]
+            fobj._rdm1 = rdm[2]
+            fobj.rdm2__ = rdm[3]
+    del rdms
+
+    if return_vec and not eeval:
+        ernorm, ervec = solve_error(Fobjs, Nocc, only_chem=only_chem)
+        return (ernorm, ervec, None)
 
     # Compute total energy
     e_1 = 0.0
     e_2 = 0.0
     e_c = 0.0
+    for fobj in Fobjs:
+        assert fobj.e_f is not None
+        e_1 += fobj.e_f[0]
+        e_2 += fobj.e_f[1]
+        e_c += fobj.e_f[2]
 
-    # I have to type ignore here, because of stupid behaviour of
-    # :code:`zip` and :code:`enumerate`
-    # https://stackoverflow.com/questions/74374059/correctly-specify-the-types-of-unpacked-zip
-    for fobj, rdm in zip(Fobjs, rdms):  # type: ignore[assignment]
-        e_1 += rdm[0][0]
-        e_2 += rdm[0][1]
-        e_c += rdm[0][2]
-        fobj.mo_coeffs = rdm[1]
-        fobj._rdm1 = rdm[2]
-        fobj.rdm2__ = rdm[3]
+    if not return_vec:
+        return (e_1 + e_2 + e_c, (e_1, e_2, e_c))
 
-    del rdms
     ernorm, ervec = solve_error(Fobjs, Nocc, only_chem=only_chem)
-
-    if return_vec:
-        return (ernorm, ervec, [e_1 + e_2 + e_c, [e_1, e_2, e_c]])
-
-    return ernorm
+    return (ernorm, ervec, [e_1 + e_2 + e_c, [e_1, e_2, e_c]])
 
 
 def be_func_parallel_u(
@@ -45,7 +45,7 @@ from quemb.molbe.lo import (
     remove_core_mo,
 )
 from quemb.molbe.misc import print_energy_cumulant, print_energy_noncumulant
-from quemb.molbe.opt import BEOPT
+from quemb.molbe.opt import BEOPT, check_opt_method
 from quemb.molbe.pfrag import Frags, union_of_frag_MOs_and_index
 from quemb.molbe.solver import Solvers, UserSolverArgs, be_func
 from quemb.shared.external.lo_helper import (
@@ -751,7 +751,7 @@ class BE:
         use_cumulant: bool = True,
         conv_tol: float = 1.0e-6,
         relax_density: bool = False,
-        jac_solver: Literal["HF", "MP2", "CCSD"] = "HF",
+        jac_solver: Literal["HF", "MP2", "CCSD", "FD"] = "HF",
         nproc: int = 1,
         ompnum: int = 4,
         max_iter: int = 500,
@@ -767,7 +767,8 @@ class BE:
         solver :
             High-level solver for the fragment, by default "CCSD"
         method :
-            Optimization method, by default 'QN'
+            Optimization method, by default 'QN'.
+            'LBFGS' selects the limited-memory BFGS variant
         only_chem :
             If true, density matching is not performed -- only global chemical potential
             is optimized, by default False
@@ -791,10 +792,17 @@ class BE:
             Defaults to 4
         jac_solver :
             Method to form Jacobian used in optimization routine, by default HF.
-            Options include HF, MP2, CCSD
+            Options include HF, MP2, CCSD, and FD (finite differences of the
+            high-level solver, evaluated in parallel if nproc > 1).
+            FD is only supported for method 'QN'.
         trust_region :
-            Use trust-region based QN optimization, by default False
+            Use trust-region based QN optimization, by default False.
+            Only supported for method 'QN'.
         """
+        check_opt_method(method)
+        if jac_solver == "FD" and method == "LBFGS":
+            raise ValueError("jac_solver='FD' is only supported for method='QN'")
+
         # Check if only chemical potential optimization is required
         if not only_chem:
             pot = self.pot
@@ -839,39 +847,39 @@ class BE:
             solver_args=solver_args,
         )
 
-        if method == "QN":
-            # Prepare the initial Jacobian matrix
-            if only_chem:
-                J0 = array([[0.0]])
-                J0 = self.get_be_error_jacobian(jac_solver=jac_solver)
-                J0 = J0[-1:, -1:]
-            else:
-                J0 = self.get_be_error_jacobian(jac_solver=jac_solver)
-
-            # Perform the optimization
-            be_.optimize(method, J0=J0, trust_region=trust_region)
-
-            # Print the energy components
-            if use_cumulant:
-                self.ebe_tot = be_.Ebe[0] + self.ebe_hf
-                print_energy_cumulant(
-                    be_.Ebe[0],
-                    be_.Ebe[1][1],
-                    be_.Ebe[1][0] + be_.Ebe[1][2],
-                    self.ebe_hf,
-                )
-            else:
-                self.ebe_tot = be_.Ebe[0] + self.enuc
-                print_energy_noncumulant(
-                    be_.Ebe[0],
-                    be_.Ebe[1][0],
-                    be_.Ebe[1][2],
-                    be_.Ebe[1][1],
-                    self.ebe_hf,
-                    self.enuc,
-                )
+        # Prepare the initial Jacobian matrix
+        if jac_solver == "FD":
+            # Built from finite differences inside BEOPT
+            J0 = None
+        elif only_chem:
+            J0 = array([[0.0]])
+            J0 = self.get_be_error_jacobian(jac_solver=jac_solver)
+            J0 = J0[-1:, -1:]
+        else:
+            J0 = self.get_be_error_jacobian(jac_solver=jac_solver)
+
+        # Perform the optimization
+        be_.optimize(method, J0=J0, trust_region=trust_region)
+
+        # Print the energy components
+        if use_cumulant:
+            self.ebe_tot = be_.Ebe[0] + self.ebe_hf
+            print_energy_cumulant(
+                be_.Ebe[0],
+                be_.Ebe[1][1],
+                be_.Ebe[1][0] + be_.Ebe[1][2],
+                self.ebe_hf,
+            )
         else:
-            raise ValueError("This optimization method for BE is not supported")
+            self.ebe_tot = be_.Ebe[0] + self.enuc
+            print_energy_noncumulant(
+                be_.Ebe[0],
+                be_.Ebe[1][0],
+                be_.Ebe[1][2],
+                be_.Ebe[1][1],
+                self.ebe_hf,
+                self.enuc,
+            )
 
     @copy_docstring(_ext_get_be_error_jacobian)
     def get_be_error_jacobian(self, jac_solver: str = "HF") -> Matrix[floating]:
@@ -3,21 +3,49 @@
 
 import logging
 import warnings
+from collections import OrderedDict
+from collections.abc import Callable, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing import get_context
+from typing import Any, Final
 
-from attrs import Factory, define
-from numpy import array, float64
+from attrs import Factory, define, field
+from numpy import abs as np_abs
+from numpy import array, asarray, ascontiguousarray, float64
 
 from quemb.kbe.pfrag import Frags as pFrags
-from quemb.molbe.be_parallel import be_func_parallel
+from quemb.molbe.be_parallel import be_func_in_worker, be_func_parallel, init_worker
 from quemb.molbe.pfrag import Frags
 from quemb.molbe.solver import Solvers, UserSolverArgs, be_func
-from quemb.shared.external.optqn import FrankQN
+from quemb.shared.external.optqn import FrankLBFGS, FrankQN
 from quemb.shared.helper import Timer
 from quemb.shared.manage_scratch import WorkDir
 from quemb.shared.typing import Matrix, Vector
 
 logger = logging.getLogger(__name__)
 
+# Number of results kept by BEOPT.objfunc if BEOPT.enable_cache is set
+_OBJFUNC_CACHE_SIZE: Final = 4
+
+# Solvers that write files to a scratch directory per fragment
+_FRAG_SCRATCH_SOLVERS: Final = ("SCI", "block2", "DMRG", "DMRGCI", "DMRGSCF")
+
+
+def check_opt_method(method: str) -> None:
+    """Raise a :class:`ValueError` if :python:`method` is not a supported
+    BE optimization method."""
+    if method not in ("QN", "LBFGS"):
+        raise ValueError(
+            f"Unsupported BE optimization method: {method!r}; "
+            "expected 'QN' or 'LBFGS'"
+        )
+
+
+def _to_float_vector(pot: Sequence[float] | Vector[float64]) -> Vector[float64]:
+    """Return the potentials as a contiguous float64 array"""
+    return ascontiguousarray(pot, dtype=float64)
+
 
 @define
 class BEOPT:
@@ -27,12 +55,13 @@ class BEOPT:
     chemical potential optimization and density matching. The main technique used in
     the optimization is a Quasi-Newton method. It interface to external
     (adapted version) module originally written by Hong-Zhou Ye.
+    Alternatively, a limited-memory BFGS variant can be used.
 
     Parameters
     ----------
     pot :
-       List of initial BE potentials. The last element is for the global
-       chemical potential.
+       Initial BE potentials. The last element is for the global
+       chemical potential. Stored as a contiguous float64 array.
     Fobjs :
        Fragment object
     Nocc :
@@ -51,7 +80,9 @@ class BEOPT:
     nproc :
        Total number of processors assigned for the optimization. Defaults to 1.
        When nproc > 1, Python multithreading
-       is invoked.
+       is invoked. The worker processes are started once and reused
+       for all iterations; :meth:`optimize` shuts them down when it returns,
+       otherwise call :meth:`close`.
     ompnum :
        If nproc > 1, ompnum sets the number of cores for OpenMP parallelization.
        Defaults to 4
@@ -62,9 +93,25 @@ class BEOPT:
        Convergence criteria for optimization. Defaults to 1e-6
     ebe_hf :
        Hartree-Fock energy. Defaults to 0.0
+    lbfgs_m :
+       Number of stored correction pairs for the :python:`"LBFGS"` method.
+       Defaults to 10
+    enable_cache :
+       Remember the results of the last few :meth:`objfunc` calls and return them
+       for bit-identical potentials without solving the fragments again.
+       On such a hit, the fragments keep the solution of the last computed
+       potentials, so their RDMs may not belong to the final potentials.
+       Defaults to False
+    probe_steps :
+       Evaluate the optimization steps, including the line-search trials and the
+       finite-difference Jacobian, without the fragment energies (no 2-RDMs and
+       no ERI contractions), which only the error vectors need.
+       The fragments are solved once more with energies at the final potentials,
+       and :python:`self.Ebe` is only set at the end of :meth:`optimize`.
+       Defaults to False
     """
 
-    pot: list[float]
+    pot: Vector[float64] = field(converter=_to_float_vector)
     Fobjs: list[Frags] | list[pFrags]
     Nocc: int
     enuc: float
@@ -79,6 +126,9 @@ class BEOPT:
     conv_tol: float = 1.0e-6
     relax_density: bool = False
     ebe_hf: float = 0.0
+    lbfgs_m: int = 10
+    enable_cache: bool = False
+    probe_steps: bool = False
 
     iter: int = 0
     err: float = 0.0
@@ -86,17 +136,132 @@ class BEOPT:
 
     solver_args: UserSolverArgs | None = None
 
-    def objfunc(self, xk: list[float]) -> Vector[float64]:
+    _pool: ProcessPoolExecutor | None = field(default=None, init=False)
+    # Arguments of the high-level solves that do not change during the optimization,
+    # and be_func or be_func_parallel with these bound, see :meth:`_get_be_call`.
+    _be_kwargs: dict[str, Any] = field(
+        init=False,
+        default=Factory(
+            lambda self: {
+                "Nocc": self.Nocc,
+                "solver": self.solver,
+                "enuc": self.enuc,
+                "only_chem": self.only_chem,
+                "relax_density": self.relax_density,
+                "scratch_dir": self.scratch_dir,
+                "solver_args": self.solver_args,
+                "use_cumulant": self.use_cumulant,
+                "eeval": not self.probe_steps,
+                "return_vec": True,
+                "frag_scratch_dirs": self._make_frag_scratch_dirs(),
+            },
+            takes_self=True,
+        ),
+    )
+    _be_call: Callable[..., Any] | None = field(default=None, init=False)
+    # (err, errvec, Ebe) of the last :meth:`objfunc` calls, keyed by xk.tobytes()
+    _cache: OrderedDict[bytes, tuple[float, Vector[float64], Matrix[float64]]] = field(
+        init=False, factory=OrderedDict
+    )
+    # Potentials of the last :meth:`objfunc` call, and for each fragment
+    # the slice of the potentials (without the chemical potential) it depends on.
+    _last_xk: Vector[float64] | None = field(default=None, init=False)
+    _frag_pot_slices: list[slice] = field(
+        init=False,
+        default=Factory(
+            lambda self: [
+                slice(fobj.udim, fobj.set_udim(fobj.udim)) for fobj in self.Fobjs
+            ],
+            takes_self=True,
+        ),
+    )
+
+    def _make_frag_scratch_dirs(self) -> list[WorkDir] | None:
+        """Create the scratch directory of each fragment once,
+        such that the solvers reuse it in every iteration.
+
+        Returns None for the solvers that do not use them."""
+        if self.solver not in _FRAG_SCRATCH_SOLVERS:
+            return None
+        frag_scratch_dirs = []
+        for fobj in self.Fobjs:
+            assert isinstance(fobj.dname, str)
+            frag_scratch_dirs.append(self.scratch_dir.make_subdir(fobj.dname))
+        return frag_scratch_dirs
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Return the persistent worker pool, starting it if necessary.
+
+        The nproc // ompnum workers are forked and inherit :python:`self.Fobjs`,
+        so the fragments are transferred once instead of pickled on every call.
+        For ompnum > 1, each worker is pinned to its own set of ompnum cores.
+        """
+        if self._pool is None:
+            ctx = get_context("fork")
+            self._pool = ProcessPoolExecutor(
+                max_workers=max(1, self.nproc // self.ompnum),
+                mp_context=ctx,
+                initializer=init_worker,
+                initargs=(self.Fobjs, self.ompnum, ctx.Value("i", 0)),
+            )
+        return self._pool
+
+    def _get_be_call(self) -> Callable[..., Any]:
+        """Return the high-level solve of all fragments as a function of the
+        potentials (and the fragment mask).
+
+        The choice between :func:`be_func` and :func:`be_func_parallel`
+        and all static arguments are bound once.
+        """
+        if self._be_call is None:
+            if self.nproc == 1:
+                self._be_call = partial(be_func, Fobjs=self.Fobjs, **self._be_kwargs)
+            else:
+                self._be_call = partial(
+                    be_func_parallel,
+                    Fobjs=self.Fobjs,
+                    nproc=self.nproc,
+                    ompnum=self.ompnum,
+                    pool=self._get_pool(),
+                    **self._be_kwargs,
+                )
+        return self._be_call
+
+    def close(self) -> None:
+        """Shut down the worker processes, if they were started."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+            # The bound call refers to the pool.
+            self._be_call = None
+
+    def __del__(self) -> None:
+        self.close()
+
+    def _get_fragment_mask(self, xk: Vector[float64]) -> list[bool] | None:
+        """Flag the fragments whose potentials changed since the last call."""
+        if self._last_xk is None:
+            return None
+        changed = np_abs(xk - self._last_xk) > 1.0e-12
+        return [
+            bool(changed[-1] or changed[pot_slice].any())
+            for pot_slice in self._frag_pot_slices
+        ]
+
+    def objfunc(self, xk: Vector[float64]) -> Vector[float64]:
         """
         Computes error vectors, RMS error, and BE energies.
 
         If nproc (set in initialization) > 1, a multithreaded function is called to
         perform high-level computations.
+        Fragments whose potentials did not change since the last call
+        are not solved again.
 
         Parameters
         ----------
         xk :
-            Current potentials in the BE optimization.
+            Current potentials in the BE optimization, as a float64 array.
+            It is passed on to the solvers without conversion.
 
         Returns
         -------
@@ -104,102 +269,194 @@ class BEOPT:
             Error vectors.
         """
 
-        # Choose the appropriate function based on the number of processors
-        if self.nproc == 1:
-            err_, errvec_, ebe_ = be_func(
-                xk,
-                self.Fobjs,
-                self.Nocc,
-                self.solver,
-                self.enuc,
-                only_chem=self.only_chem,
-                relax_density=self.relax_density,
-                scratch_dir=self.scratch_dir,
-                solver_args=self.solver_args,
-                use_cumulant=self.use_cumulant,
-                eeval=True,
-                return_vec=True,
-            )
-        else:
-            err_, errvec_, ebe_ = be_func_parallel(
-                xk,
-                self.Fobjs,
-                self.Nocc,
-                self.solver,
-                self.enuc,
-                only_chem=self.only_chem,
-                nproc=self.nproc,
-                ompnum=self.ompnum,
-                relax_density=self.relax_density,
-                scratch_dir=self.scratch_dir,
-                solver_args=self.solver_args,
-                use_cumulant=self.use_cumulant,
-                eeval=True,
-                return_vec=True,
-            )
+        xk = asarray(xk, dtype=float64)
+        if self.enable_cache:
+            key = xk.tobytes()
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.err, errvec_, self.Ebe = self._cache[key]
+                return errvec_
+
+        fragment_mask = self._get_fragment_mask(xk)
+
+        err_, errvec_, ebe_ = self._get_be_call()(xk, fragment_mask=fragment_mask)
 
         # Update error and BE energy
         self.err = err_
         self.Ebe = ebe_
+        # The caller may modify xk in place afterwards.
+        self._last_xk = xk.copy()
+        if self.enable_cache:
+            self._cache[key] = (err_, errvec_, ebe_)
+            if len(self._cache) > _OBJFUNC_CACHE_SIZE:
+                self._cache.popitem(last=False)
         return errvec_
 
-    def optimize(self, method, J0=None, trust_region=False):
+    def _evaluate_energy(self, xk: Vector[float64]) -> None:
+        """Solve all fragments with energies at the potentials :python:`xk`
+        and set :python:`self.err` and :python:`self.Ebe`."""
+        xk = asarray(xk, dtype=float64)
+        self.err, _, self.Ebe = self._get_be_call()(xk, eeval=True)
+        self._last_xk = xk.copy()
+
+    def objfunc_batch(self, xks: list[Vector[float64]]) -> list[Vector[float64]]:
+        """
+        Computes error vectors for several potentials at once.
+
+        The fragments are solved without energies, and the results are not
+        cached. If nproc == 1, each point only re-solves the fragments whose
+        potentials differ from the previous point.
+        If nproc > 1, the potentials are distributed over the
+        nproc // ompnum worker processes of the persistent pool,
+        each of which solves serially, using ompnum OpenMP threads,
+        the fragments whose potentials differ from those of the last
+        :meth:`objfunc` call; the other fragments keep that solution.
+        The solvers write their files to a scratch directory private to each
+        worker.
+        In contrast to :meth:`objfunc`, :python:`self.err` and :python:`self.Ebe`
+        are not changed.
+
+        Parameters
+        ----------
+        xks :
+            Potentials to evaluate.
+
+        Returns
+        -------
+        list
+            Error vectors, in the order of :python:`xks`.
+        """
+        if self.nproc == 1:
+            be_call = self._get_be_call()
+            errvecs = []
+            for xk in xks:
+                xk = asarray(xk, dtype=float64)
+                _, errvec_, _ = be_call(
+                    xk, fragment_mask=self._get_fragment_mask(xk), eeval=False
+                )
+                self._last_xk = xk.copy()
+                errvecs.append(errvec_)
+            # The re-solved fragments have no energies,
+            # so the next call has to solve all fragments.
+            self._last_xk = None
+            return errvecs
+
+        pool = self._get_pool()
+        be_kwargs = self._be_kwargs | {"eeval": False}
+        futures = []
+        for xk in xks:
+            fragment_mask = self._get_fragment_mask(xk)
+            fixed_rdm1s = (
+                None
+                if fragment_mask is None
+                else {
+                    frag_idx: fobj._rdm1
+                    for frag_idx, (fobj, solve) in enumerate(
+                        zip(self.Fobjs, fragment_mask)
+                    )
+                    if not solve
+                }
+            )
+            futures.append(
+                pool.submit(
+                    be_func_in_worker,
+                    xk,
+                    fragment_mask=fragment_mask,
+                    fixed_rdm1s=fixed_rdm1s,
+                    **be_kwargs,
+                )
+            )
+        return [future.result()[1] for future in futures]
+
+    def optimize(self, method, J0=None, f0=None, trust_region=False):
         """Main kernel to perform BE optimization
 
         Parameters
         ----------
         method : str
-           High-level quantum chemistry method.
+           Optimization method, either 'QN' or 'LBFGS'.
         J0 : list of list of float, optional
-           Initial Jacobian
+           Initial Jacobian. If None, 'QN' builds it from central finite
+           differences, evaluated via :meth:`objfunc_batch`, while 'LBFGS'
+           starts from a scaled identity.
+        f0 : tuple, optional
+           Precomputed :python:`(err, errvec, Ebe)` at :python:`self.pot`, i.e. the
+           return value of :func:`quemb.molbe.solver.be_func` with
+           :python:`return_vec=True`, e.g. when resuming from a checkpoint.
+           If given, the initial evaluation of :meth:`objfunc` is skipped.
         trust_region : bool, optional
-           Use trust-region based QN optimization, by default False
+           Use trust-region based QN optimization, by default False.
+           Only supported for 'QN'.
+
+        The worker processes (for nproc > 1) are shut down when the optimization
+        finishes, also if it fails.
         """
-        print("-----------------------------------------------------", flush=True)
-        print("             Starting BE optimization ", flush=True)
-        print("             Solver : ", self.solver, flush=True)
+        check_opt_method(method)
+        if trust_region and method == "LBFGS":
+            raise ValueError("trust_region is only supported for method='QN'")
+
+        logger.info("-----------------------------------------------------")
+        logger.info("             Starting BE optimization ")
+        logger.info(f"             Solver : {self.solver}")
         if self.only_chem:
-            print("             Chemical Potential Optimization", flush=True)
-        print("-----------------------------------------------------", flush=True)
-        print(flush=True)
-        if method == "QN":
+            logger.info("             Chemical Potential Optimization")
+        logger.info("-----------------------------------------------------")
+        # Skip building the per-iteration messages if nobody listens.
+        verbose = logger.isEnabledFor(logging.INFO)
+        try:
             step0_timer = Timer("Time to complete Iteration 0")
-            print("-- Beginning optimization iteration ", self.iter, flush=True)
+            logger.info(f"-- Beginning optimization iteration {self.iter}")
 
-            # Initial step
-            f0 = self.objfunc(self.pot)
+            # The optimizers never modify x0 in place, so no copy is needed.
+            x0 = self.pot
 
-            print(
-                f"Error in density matching      :   {self.err:>2.4e}",
-                flush=True,
-            )
-            print(flush=True)
-
-            # Initialize the Quasi-Newton optimizer
-            optQN = FrankQN(
-                self.objfunc, array(self.pot), f0, J0, max_space=self.max_space
-            )
+            # Initial step
+            if f0 is None:
+                f0 = self.objfunc(x0)
+            else:
+                self.err, errvec0, self.Ebe = f0
+                f0 = asarray(errvec0, dtype=float64)
 
-            logger.info(f"Step 0 time: {step0_timer.str_elapsed()}")
+            if verbose:
+                logger.info(f"Error in density matching      :   {self.err:>2.4e}")
+                logger.info(f"Step 0 time: {step0_timer.str_elapsed()}")
+            x_final = x0
             if self.err < self.conv_tol:
-                print(flush=True)
-                print("CONVERGED w/o Optimization Steps", flush=True)
-                print(flush=True)
+                logger.info("CONVERGED w/o Optimization Steps")
             else:
+                # Initialize the Quasi-Newton optimizer
+                if method == "QN":
+                    optQN = FrankQN(
+                        self.objfunc,
+                        x0,
+                        f0,
+                        J0,
+                        max_space=self.max_space,
+                        func_batch=self.objfunc_batch,
+                    )
+                else:
+                    optQN = FrankLBFGS(self.objfunc, x0, f0, J0, m=self.lbfgs_m)
+
                 # Perform optimization steps
                 for iter_ in range(self.max_space):
                     iter_timer = Timer("Time to complete Iteration " + str(self.iter))
-                    print("-- In iter ", self.iter, flush=True)
-                    optQN.next_step(self.iter, trust_region=trust_region)
-                    self.iter += 1
-                    print(
-                        f"Error in density matching      :   {self.err:>2.4e}",
-                        flush=True,
+                    if verbose:
+                        logger.info(f"-- In iter {self.iter}")
+                    optQN.next_step(
+                        self.iter,
+                        trust_region=trust_region,
+                        # Stop the line search once converged.
+                        stop_fn=lambda: self.err < self.conv_tol,
                     )
-                    logger.info(f"Iteration time: {iter_timer.str_elapsed()}")
+                    self.iter += 1
+                    x_final = optQN.xnew
+                    if verbose:
+                        logger.info(
+                            f"Error in density matching      :   {self.err:>2.4e}"
+                        )
+                        logger.info(f"Iteration time: {iter_timer.str_elapsed()}")
                     if self.err < self.conv_tol:
-                        print(flush=True)
-                        print("CONVERGED", flush=True)
+                        logger.info("CONVERGED")
                         logger.info(
                             step0_timer.str_elapsed(
                                 "Total time to complete BE optimization"
@@ -208,5 +465,7 @@ class BEOPT:
                         break
                 if self.err >= self.conv_tol:
                     warnings.warn(f"BE DID NOT CONVERGE IN {self.max_space} STEPS")
-        else:
-            raise ValueError("This optimization method for BE is not supported")
+            if self.probe_steps:
+                self._evaluate_energy(x_final)
+        finally:
+            self.close()
@@ -136,6 +136,10 @@ class Frags:
         self.genvs = None
         self.ebe = 0.0
         self.ebe_hf = 0.0
+        # [e1, e2, ec] of the last high-level solve
+        self.e_f: list[float] | None = None
+        # index arrays of the density matching, see quemb.molbe.solver.solve_error
+        self._matching_idx: tuple[Matrix[int64], Matrix[int64]] | None = None
         self.fock = None
         self.veff = None
         self.veff0 = None
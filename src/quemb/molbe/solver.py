@@ -2,6 +2,7 @@
 
 import os
 from abc import ABC
+from collections.abc import Sequence
 from pathlib import Path
 from typing import Final, Literal, TypeAlias
 from warnings import warn
@@ -11,15 +12,20 @@ from numpy import (
     allclose,
     array,
     asarray,
+    concatenate,
+    cumsum,
     diag,
     diag_indices,
     einsum,
+    empty,
+    float64,
     floating,
-    mean,
+    int64,
     ndarray,
+    sqrt,
     zeros_like,
 )
-from numpy.linalg import multi_dot
+from numpy.linalg import multi_dot, norm
 from pyscf import ao2mo, cc, fci, mcscf, mp
 from pyscf.cc.ccsd_rdm import make_rdm2
 from pyscf.mp.mp2 import MP2
@@ -35,7 +41,7 @@ from quemb.shared.external.ccsd_rdm import (
 )
 from quemb.shared.external.uccsd_eri import make_eris_incore
 from quemb.shared.external.unrestricted_utils import make_uhf_obj
-from quemb.shared.helper import delete_multiple_files, unused
+from quemb.shared.helper import delete_multiple_files, njit, unused
 from quemb.shared.manage_scratch import WorkDir
 from quemb.shared.typing import Matrix, Vector
 
@@ -242,7 +248,7 @@ class _SHCI_Args:
 
 
 def be_func(
-    pot: list[float] | None,
+    pot: Vector[float64] | None,
     Fobjs: list[Frags] | list[pFrags],
     Nocc: int,
     solver: Solvers,
@@ -254,6 +260,8 @@ def be_func(
     relax_density: bool = False,
     return_vec: bool = False,
     use_cumulant: bool = True,
+    fragment_mask: Sequence[bool] | None = None,
+    frag_scratch_dirs: Sequence[WorkDir] | None = None,
 ):
     """
     Perform bootstrap embedding calculations for each fragment.
@@ -264,7 +272,8 @@ def be_func(
     Parameters
     ----------
     pot :
-        List of potentials.
+        Array of potentials, the last element is the chemical potential.
+        Callers must pass a float64 :class:`numpy.ndarray` (or None).
     Fobjs : list of quemb.molbe.autofrag.FragPart
         List of fragment objects.
     Nocc :
@@ -287,6 +296,14 @@ def be_func(
         Whether to evaluate the energy. Defaults to False.
     return_vec :
         Whether to return the error vector. Defaults to False.
+    fragment_mask :
+        Only solve the fragments for which this is True.
+        The other fragments keep their RDMs and energies from the previous call,
+        which is exact if their potentials did not change. Defaults to all True.
+    frag_scratch_dirs :
+        Scratch directory of each fragment for the solvers that need one ('SCI',
+        DMRG). If given, these are reused instead of creating
+        :code:`scratch_dir / dname` on every call.
 
     Returns
     -------
@@ -298,7 +315,14 @@ def be_func(
         total_e = [0.0, 0.0, 0.0]
 
     # Loop over each fragment and solve using the specified solver
-    for fobj in Fobjs:
+    for frag_idx in range(len(Fobjs)):
+        fobj = Fobjs[frag_idx]
+        if fragment_mask is not None and not fragment_mask[frag_idx]:
+            if eeval:
+                assert fobj.e_f is not None
+                total_e = [sum(x) for x in zip(total_e, fobj.e_f)]
+            continue
+
         # Update the effective Hamiltonian
         if pot is not None:
             fobj.update_heff(pot, only_chem=only_chem)
@@ -444,8 +468,10 @@ def be_func(
                     )
                 frag_scratch = WorkDir(frag_name, cleanup_at_end=False)
                 print("Fragment Scratch Directory:", frag_scratch)
-            else:
+            elif frag_scratch_dirs is None:
                 frag_scratch = WorkDir(scratch_dir / fobj.dname)
+            else:
+                frag_scratch = frag_scratch_dirs[frag_idx]
             ci = cornell_shci.SHCI()
             ci.runtimedir = frag_scratch
             ci.restart = True
@@ -463,7 +489,10 @@ def be_func(
 
         elif solver in ["block2", "DMRG", "DMRGCI", "DMRGSCF"]:
             assert isinstance(fobj.dname, str)
-            frag_scratch = WorkDir(scratch_dir / fobj.dname)
+            if frag_scratch_dirs is None:
+                frag_scratch = WorkDir(scratch_dir / fobj.dname)
+            else:
+                frag_scratch = frag_scratch_dirs[frag_idx]
 
             assert isinstance(solver_args, DMRG_ArgsUser)
             DMRG_args = _DMRG_Args.from_user_input(solver_args, fobj._mf)
@@ -543,8 +572,12 @@ def be_func(
                 use_cumulant=use_cumulant,
                 eri_file=fobj.eri_file,
             )
+            fobj.e_f = e_f
             total_e = [sum(x) for x in zip(total_e, e_f)]
             fobj.update_ebe_hf()
+        else:
+            # The energy of the previous solve is outdated.
+            fobj.e_f = None
     if eeval:
         Ecorr = sum(total_e)
         if not return_vec:
@@ -553,7 +586,7 @@ def be_func(
     ernorm, ervec = solve_error(Fobjs, Nocc, only_chem=only_chem)
 
     if return_vec:
-        return (ernorm, ervec, [Ecorr, total_e])
+        return (ernorm, ervec, [Ecorr, total_e] if eeval else None)
 
     return ernorm
 
@@ -699,10 +732,8 @@ def solve_error(Fobjs, Nocc, only_chem=False):
         Error vector.
     """
 
-    err_edge = []
-    err_chempot = 0.0
-
     if only_chem:
+        err_chempot = 0.0
         for fobj in Fobjs:
             # Compute chemical potential error for each fragment
             for i in fobj.weight_and_relAO_per_center[1]:
@@ -712,49 +743,99 @@ def solve_error(Fobjs, Nocc, only_chem=False):
 
         return abs(err), asarray([err])
 
-    # Compute edge and chemical potential errors
-    for fobj in Fobjs:
-        # match rdm-edge
-        for edge in fobj.relAO_per_edge:
-            for j_ in range(len(edge)):
-                for k_ in range(len(edge)):
-                    if j_ > k_:
-                        continue
-                    err_edge.append(fobj._rdm1[edge[j_], edge[k_]])
-        # chem potential
-        for i in fobj.weight_and_relAO_per_center[1]:
-            err_chempot += fobj._rdm1[i, i]
-
-    err_chempot /= Fobjs[0].unitcell_nkpt
-    err_edge.append(err_chempot)  # far-end edges are included as err_chempot
-
-    # Compute center errors
-    err_cen = []
-    for findx, fobj in enumerate(Fobjs):
-        # Match RDM for centers
-        for cindx, cens in enumerate(fobj.relAO_in_ref_per_edge):
-            lenc = len(cens)
-            for j_ in range(lenc):
-                for k_ in range(lenc):
-                    if j_ > k_:
-                        continue
-                    err_cen.append(
-                        Fobjs[fobj.ref_frag_idx_per_edge[cindx]]._rdm1[
-                            cens[j_], cens[k_]
-                        ]
-                    )
+    # Compute edge and chemical potential errors, matched against the centers.
+    # The rdms are packed into one buffer to pass them at once to the jitted kernel.
+    matched_idx, center_idx = _get_matching_idx(Fobjs)
+    rdm1s = [asarray(fobj._rdm1, dtype=float64) for fobj in Fobjs]
+    n_orb = array([rdm1.shape[0] for rdm1 in rdm1s], dtype=int64)
+    offsets = concatenate(([0], cumsum(n_orb**2)[:-1]))
+    err_vec = _assemble_errvec(
+        concatenate([rdm1.ravel() for rdm1 in rdm1s]),
+        offsets,
+        n_orb,
+        matched_idx,
+        center_idx,
+        float(Fobjs[0].unitcell_nkpt),
+        float(Nocc),
+    )
 
-    err_cen.append(Nocc)
-    err_edge = array(err_edge)
-    err_cen = array(err_cen)
+    # Compute the RMS norm of the error vector,
+    # err_vec is contiguous in float64, so this is a single BLAS nrm2 call.
+    norm_ = norm(err_vec) / sqrt(err_vec.size)
 
-    # Compute the error vector
-    err_vec = err_edge - err_cen
+    return norm_, err_vec
 
-    # Compute the norm of the error vector
-    norm_ = mean(err_vec * err_vec) ** 0.5
 
-    return norm_, err_vec
+def _get_matching_idx(
+    Fobjs: list[Frags] | list[pFrags],
+) -> tuple[Matrix[int64], Matrix[int64]]:
+    """Index arrays of the density matching in :func:`solve_error`.
+
+    The rows of the first array are (fragment, row, column, reference fragment,
+    row, column) of each matched pair of rdm elements, i.e. the upper triangle
+    of each edge and the same elements in the fragment where the edge is a center.
+    The rows of the second array are (fragment, index) of the center sites,
+    whose occupation gives the chemical potential error.
+    The index arrays depend only on the fragmentation,
+    so they are built once per fragment and then reused.
+    """
+    matched_idx, center_idx = [], []
+    for frag_idx in range(len(Fobjs)):
+        fobj = Fobjs[frag_idx]
+        if fobj._matching_idx is None:
+            matched = [
+                (frag_idx, edge[j_], edge[k_], ref_idx, cens[j_], cens[k_])
+                for edge, ref_idx, cens in zip(
+                    fobj.relAO_per_edge,
+                    fobj.ref_frag_idx_per_edge,
+                    fobj.relAO_in_ref_per_edge,
+                )
+                for j_ in range(len(edge))
+                for k_ in range(j_, len(edge))
+            ]
+            centers = [(frag_idx, i) for i in fobj.weight_and_relAO_per_center[1]]
+            fobj._matching_idx = (
+                array(matched, dtype=int64).reshape(-1, 6),
+                array(centers, dtype=int64).reshape(-1, 2),
+            )
+        matched_idx.append(fobj._matching_idx[0])
+        center_idx.append(fobj._matching_idx[1])
+    return concatenate(matched_idx), concatenate(center_idx)
+
+
+@njit(nogil=True)
+def _assemble_errvec(
+    rdm1s: Vector[float64],
+    offsets: Vector[int64],
+    n_orb: Vector[int64],
+    matched_idx: Matrix[int64],
+    center_idx: Matrix[int64],
+    unitcell_nkpt: float,
+    Nocc: float,
+) -> Vector[float64]:
+    """Gather the error vector of :func:`solve_error` from the fragment rdms.
+
+    The rdm of fragment :python:`f` is stored row-major in
+    :python:`rdm1s[offsets[f] : offsets[f] + n_orb[f]**2]`.
+    See :func:`_get_matching_idx` for the index arrays.
+    The last element is the chemical potential error.
+    """
+    n_matched = len(matched_idx)
+    err_vec = empty(n_matched + 1)
+    for i in range(n_matched):
+        f, p, q, ref, r, s = matched_idx[i]
+        err_vec[i] = (
+            rdm1s[offsets[f] + p * n_orb[f] + q]
+            - rdm1s[offsets[ref] + r * n_orb[ref] + s]
+        )
+
+    err_chempot = 0.0
+    for i in range(len(center_idx)):
+        f, p = center_idx[i]
+        err_chempot += rdm1s[offsets[f] + p * n_orb[f] + p]
+    # far-end edges are included as err_chempot
+    err_vec[n_matched] = err_chempot / unitcell_nkpt - Nocc
+    return err_vec
 
 
 def solve_mp2(
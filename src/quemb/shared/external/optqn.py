@@ -6,10 +6,12 @@
 #         The code has been slightly modified.
 #
 import logging
+from collections import deque
 from collections.abc import Sequence
 
 from numpy import array, empty, float64, outer, zeros
 from numpy.linalg import inv, norm, pinv
+from scipy.linalg import get_blas_funcs
 
 from quemb.kbe.pfrag import Frags as pFrags
 from quemb.molbe.helper import get_eri, get_scfObj
@@ -17,14 +19,22 @@ from quemb.molbe.pfrag import Frags
 from quemb.shared.external.cphf_utils import cphf_kernel_batch, get_rhf_dP_from_u
 from quemb.shared.external.cpmp2_utils import get_dPmp2_batch_r
 from quemb.shared.external.jac_utils import get_dPccsdurlx_batch_u
-from quemb.shared.typing import GlobalAOIdx, Matrix, RelAOIdx, SeqOverEdge
+from quemb.shared.helper import njit
+from quemb.shared.typing import GlobalAOIdx, Matrix, RelAOIdx, SeqOverEdge, Vector
 
 logger = logging.getLogger(__name__)
 
+# BLAS rank-1 update, a += alpha * outer(x, y)
+_dger = get_blas_funcs("ger", dtype=float64)
 
-def line_search_LF(func, xold, fold, dx, iter_):
+
+def line_search_LF(func, xold, fold, dx, iter_, stop_fn=None):
     """Adapted from D.-H. Li and M. Fukushima, Optimization Metheods and Software,
-    13, 181 (2000)"""
+    13, 181 (2000)
+
+    If :python:`stop_fn` is given, the backtracking stops as soon as
+    :python:`stop_fn()` is True after an evaluation of :python:`func`,
+    and the current point is accepted."""
     beta = 0.1
     rho = 0.9
     sigma1 = 1e-3
@@ -36,13 +46,14 @@ def line_search_LF(func, xold, fold, dx, iter_):
 
     fk = func(xk)
     lcout += 1
+    stop = stop_fn is not None and stop_fn()
 
     norm_dx = norm(dx)
     norm_fk = norm(fk)
     norm_fold = norm(fold)
     alp = 1.0
 
-    if norm_fk > rho * norm_fold - sigma2 * norm_dx**2.0:
+    if not stop and norm_fk > rho * norm_fold - sigma2 * norm_dx**2.0:
         while norm_fk > (1.0 + eta) * norm_fold - sigma1 * alp**2.0 * norm_dx**2.0:
             alp *= beta
             xk = xold + alp * dx
@@ -51,15 +62,15 @@ def line_search_LF(func, xold, fold, dx, iter_):
 
             lcout += 1
             norm_fk = norm(fk)
-            if lcout == 20:
+            if lcout == 20 or (stop_fn is not None and stop_fn()):
                 break
 
-    print(" No. of line search steps in QN opt :", lcout, flush=True)
-    print(flush=True)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(f" No. of line search steps in QN opt : {lcout}")
     return alp, xk, fk
 
 
-def trustRegion(func, xold, fold, Binv, c=0.5):
+def trustRegion(func, xold, fold, Binv, c=0.5, stop_fn=None):
     r"""Perform Trust Region Optimization.
 
     See "A Broyden Trust Region Quasi-Newton Method
@@ -79,6 +90,9 @@ def trustRegion(func, xold, fold, Binv, c=0.5):
         through Sherman-Morrison formula
     c : float, optional
         Initial value of trust radius :math:`\in (0, 1)`, by default 0.5
+    stop_fn : typing.Callable, optional
+        Checked after each evaluation of :python:`func`; if it returns True,
+        the current step is accepted without further micro iterations.
 
     Returns
     -------
@@ -96,6 +110,8 @@ def trustRegion(func, xold, fold, Binv, c=0.5):
     t = norm(dx_sd) ** 2 / norm(B @ dx_sd) ** 2
     prevdx = None
     ared = 0.0  # Reduction in the objective function; Initialize value to 0
+    # Skip building the per-step messages if nobody listens.
+    verbose = logger.isEnabledFor(logging.INFO)
     while ratio < rho or ared < 0.0:
         # Trust Region subproblem
         # minimize (1/2) ||F_k + B_k d||^2 w.r.t. d, s.t. d w/i trust radius
@@ -103,28 +119,23 @@ def trustRegion(func, xold, fold, Binv, c=0.5):
         if norm(dx_gn) < max(1.0, norm(xold)) * (
             c**microiter
         ):  # Gauss-Newton step within the trust radius
-            print(
-                "  Trust Region Optimization Step ",
-                microiter,
-                ": Gauss-Newton",
-                flush=True,
-            )
+            if verbose:
+                logger.info(
+                    f"  Trust Region Optimization Step {microiter}: Gauss-Newton"
+                )
             dx = dx_gn
         elif t * norm(dx_sd) > max(1.0, norm(xold)) * (
             c**microiter
         ):  # GN step outside, SD step also outside
-            print(
-                "  Trust Region Optimization Step ",
-                microiter,
-                ": Steepest Descent",
-                flush=True,
-            )
+            if verbose:
+                logger.info(
+                    f"  Trust Region Optimization Step {microiter}: Steepest Descent"
+                )
             dx = (c**microiter) / norm(dx_sd) * dx_sd
         else:  # GN step outside, SD step inside (dog leg step)
             # dx := t*dx_sd + s (dx_gn - t*dx_sd) s.t. ||dx|| = c^p
-            print(
-                "  Trust Region Optimization Step ", microiter, ": Dog Leg", flush=True
-            )
+            if verbose:
+                logger.info(f"  Trust Region Optimization Step {microiter}: Dog Leg")
             tdx_sd = t * dx_sd
             diff = dx_gn - tdx_sd
             # s = (-dx_sd.T@diff + sqrt((dx_sd.T@diff)**2 -
@@ -139,6 +150,8 @@ def trustRegion(func, xold, fold, Binv, c=0.5):
         if prevdx is None or not all(dx == prevdx):
             # Actual Reduction := f(x_k) - f(x_k + dx)
             fnew = func(xold + dx)
+            if stop_fn is not None and stop_fn():
+                return xold + dx, fnew
             ared = 0.5 * (norm(fold) ** 2 - norm(fnew) ** 2)
             # Predicted Reduction := q(0) - q(dx) where q = (1/2) ||F_k + B_k d||^2
             pred = 0.5 * (norm(fold) ** 2 - norm(fold + B @ dx) ** 2)
@@ -155,19 +168,59 @@ def trustRegion(func, xold, fold, Binv, c=0.5):
     return xold + dx, fnew  # xnew
 
 
+def get_fd_jacobian(func, x0, h=1.0e-3, func_batch=None):
+    """Central finite-difference Jacobian of :python:`func` at :python:`x0`
+
+    Parameters
+    ----------
+    func : typing.Callable
+        Cost function, used if :python:`func_batch` is None.
+    x0 : numpy.ndarray
+        Point at which the Jacobian is evaluated.
+    h : float, optional
+        Step size, by default 1e-3
+    func_batch : typing.Callable, optional
+        Evaluates a list of points at once, e.g. in parallel.
+
+    Returns
+    -------
+    numpy.ndarray
+        Jacobian with :python:`J[:, i] = (f(x0 + h e_i) - f(x0 - h e_i)) / 2h`.
+    """
+    n = x0.size
+    xks = []
+    for i in range(n):
+        for sign in (1.0, -1.0):
+            xk = x0.copy()
+            xk[i] += sign * h
+            xks.append(xk)
+
+    fks = func_batch(xks) if func_batch is not None else [func(xk) for xk in xks]
+
+    J = empty([len(fks[0]), n])
+    for i in range(n):
+        J[:, i] = (fks[2 * i] - fks[2 * i + 1]) / (2.0 * h)
+    return J
+
+
 class FrankQN:
     """Quasi Newton Optimization
 
     Performs quasi newton optimization. Interfaces many functionalities of the
     frankestein code originally written by Hong-Zhou Ye
+
+    If :python:`J0` is None, the initial Jacobian is obtained from
+    :func:`get_fd_jacobian`, using :python:`func_batch` if given.
     """
 
-    def __init__(self, func, x0, f0, J0, trust=0.5, max_space=500):
+    def __init__(self, func, x0, f0, J0, trust=0.5, max_space=500, func_batch=None):
         self.x0 = x0
         self.n = x0.size
         self.f0 = f0
         self.func = func
 
+        if J0 is None:
+            J0 = get_fd_jacobian(func, x0, func_batch=func_batch)
         self.B0 = pinv(J0)
 
         self.tol_gmres = 1.0e-6
@@ -183,7 +236,7 @@ class FrankQN:
         self.B = None
         self.trust = trust
 
-    def next_step(self, iter, trust_region=False):
+    def next_step(self, iter, trust_region=False, stop_fn=None):
         if iter == 0:
             self.xnew = self.x0
             self.fnew = self.func(self.xnew) if self.f0 is None else self.f0
@@ -200,20 +253,22 @@ class FrankQN:
         self.fold = self.fnew.copy()
 
         if not iter == 0:
-            tmp__ = outer(dx_i - self.Binv @ df_i, dx_i @ self.Binv) / (
-                dx_i @ self.Binv @ df_i
-            )
-            self.Binv += tmp__
+            _broyden_update(self.Binv, dx_i, df_i)
 
         if trust_region:
             self.xnew, self.fnew = trustRegion(
-                self.func, self.xold, self.fold, self.Binv, c=self.trust
+                self.func,
+                self.xold,
+                self.fold,
+                self.Binv,
+                c=self.trust,
+                stop_fn=stop_fn,
             )
         else:
             self.us[iter] = self.get_Bnfn(iter)
 
             _, self.xnew, self.fnew = line_search_LF(
-                self.func, self.xold, self.fold, -self.us[iter], iter
+                self.func, self.xold, self.fold, -self.us[iter], iter, stop_fn=stop_fn
             )
 
             # udpate vs, dxs, and fs
@@ -222,29 +277,146 @@ class FrankQN:
         if iter + 1 < self.max_subspace:
             self.fs[iter + 1] = self.fnew.copy()
         else:
-            print("Reached the maximum number of iterations:", self.max_subspace)
+            logger.info(
+                f"Reached the maximum number of iterations: {self.max_subspace}"
+            )
 
     def get_Bnfn(self, n):
         # self.us; self.dxs; self.vs
         if n == 0:
             return self.us[0]
+        return _get_Bnfn(self.us, self.dxs, self.vs, n)
+
+
+def _broyden_update(
+    Binv: Matrix[float64], dx: Vector[float64], df: Vector[float64]
+) -> None:
+    """In-place rank-1 (good) Broyden update of the inverse Jacobian
 
-        vs = [None] * n
-        for i in range(n):
-            vs[i] = self.vs[n - i - 1]
-        for i in range(1, n + 1):
-            un_ = self.us[i - 1]
-            dxn_ = self.dxs[i - 1]
-            vps = [None] * (n - i + 1)
-            for j in range(n - i + 1):
-                a = vs[j]
-                b = vs[n - i] - un_
+    :python:`Binv += outer(dx - Binv @ df, dx @ Binv) / (dx @ Binv @ df)`
+
+    For a C-contiguous float64 :python:`Binv`, the update is a single BLAS
+    :code:`dger` call on the Fortran-ordered view :python:`Binv.T`,
+    for which the two vectors swap their roles.
+    Otherwise dger would work on a copy, so the outer product is added instead.
+    """
+    u = dx - Binv @ df
+    w = dx @ Binv
+    alpha = 1.0 / (w @ df)
+    if Binv.flags.c_contiguous and Binv.dtype == float64:
+        _dger(alpha, w, u, a=Binv.T, overwrite_a=True)
+    else:
+        Binv += alpha * outer(u, w)
 
-                vps[j] = a + (dxn_ @ a) / (dxn_ @ b) * (dxn_ - b)
 
-            vs = vps
+@njit(nogil=True)
+def _get_Bnfn(
+    us: Matrix[float64], dxs: Matrix[float64], vs: Matrix[float64], n: int
+) -> Vector[float64]:
+    """Apply the recursively updated inverse Jacobian :math:`B_n` to :math:`f_n`
 
-        return vs[0]
+    The vectors :python:`V[j]` are updated in place, since the
+    step :python:`i` only needs the first :python:`n - i + 1` of them.
+    """
+    V = vs[:n][::-1].copy()
+    for i in range(1, n + 1):
+        dxn_ = dxs[i - 1]
+        b = V[n - i] - us[i - 1]
+        d = dxn_ - b
+        denom = dxn_ @ b
+        for j in range(n - i + 1):
+            V[j] += (dxn_ @ V[j]) / denom * d
+    return V[0]
+
+
+class FrankLBFGS:
+    r"""Limited-memory BFGS Optimization
+
+    Drop-in alternative to :class:`FrankQN` that keeps only the last :python:`m`
+    pairs :math:`s_k = x_{k+1} - x_k` and :math:`y_k = f_{k+1} - f_k`
+    instead of the full subspace.
+    The inverse Jacobian is applied via Nocedal's two-loop recursion,
+    which reduces memory from :math:`O(n^2)` to :math:`O(mn)`.
+
+    If :python:`J0` is given, its pseudo-inverse is used as initial inverse Jacobian,
+    otherwise the identity scaled by
+    :math:`\gamma_k = s_{k-1}^T y_{k-1} / y_{k-1}^T y_{k-1}`.
+    Since we solve :math:`f(x) = 0` rather than minimize, pairs are only rejected
+    if :math:`s_k^T y_k` vanishes; the secant condition holds for either sign.
+    """
+
+    def __init__(self, func, x0, f0, J0, m=10):
+        self.x0 = x0
+        self.n = x0.size
+        self.f0 = f0
+        self.func = func
+
+        self.B0 = None if J0 is None else pinv(J0)
+
+        self.xnew = None
+        self.xold = None
+        self.fnew = None
+        self.fold = None
+        self.m = m
+        self.s_history = deque(maxlen=m)
+        self.y_history = deque(maxlen=m)
+        self.rho_history = deque(maxlen=m)
+
+    def next_step(self, iter, trust_region=False, stop_fn=None):
+        if trust_region:
+            raise NotImplementedError("Trust region is not implemented for L-BFGS")
+
+        if iter == 0:
+            self.xnew = self.x0
+            self.fnew = self.func(self.xnew) if self.f0 is None else self.f0
+        else:
+            s_k = self.xnew - self.xold
+            y_k = self.fnew - self.fold
+            sy = s_k @ y_k
+            if abs(sy) > 1.0e-12 * norm(s_k) * norm(y_k):
+                self.s_history.append(s_k)
+                self.y_history.append(y_k)
+                self.rho_history.append(1.0 / sy)
+
+        self.xold = self.xnew.copy()
+        self.fold = self.fnew.copy()
+
+        _, self.xnew, self.fnew = line_search_LF(
+            self.func,
+            self.xold,
+            self.fold,
+            -self.get_Hf(self.fold),
+            iter,
+            stop_fn=stop_fn,
+        )
+
+    def get_Hf(self, f):
+        """Apply the L-BFGS inverse Jacobian to :python:`f` (two-loop recursion)"""
+        q = f.copy()
+        alphas = []
+        for s_i, y_i, rho_i in zip(
+            reversed(self.s_history),
+            reversed(self.y_history),
+            reversed(self.rho_history),
+        ):
+            alpha_i = rho_i * (s_i @ q)
+            q -= alpha_i * y_i
+            alphas.append(alpha_i)
+
+        if self.B0 is not None:
+            r = self.B0 @ q
+        elif self.s_history:
+            s_k, y_k = self.s_history[-1], self.y_history[-1]
+            r = (s_k @ y_k) / (y_k @ y_k) * q
+        else:
+            r = q
+
+        for s_i, y_i, rho_i, alpha_i in zip(
+            self.s_history, self.y_history, self.rho_history, reversed(alphas)
+        ):
+            beta_i = rho_i * (y_i @ r)
+            r += (alpha_i - beta_i) * s_i
+        return r
 
 
 def get_be_error_jacobian(n_frag, Fobjs, jac_solver="HF"):
@@ -6,17 +6,168 @@ Author(s): Minsik Cho
 """
 
 import unittest
+from unittest.mock import Mock
 
+from numpy import array, float64, mean
+from numpy.random import default_rng
 from pyscf import gto, scf
 
 from quemb.molbe import BE, fragmentate
 from quemb.molbe.fragment import ChemGenArgs
+from quemb.molbe.opt import _OBJFUNC_CACHE_SIZE, BEOPT
+from quemb.molbe.solver import solve_error
 
 
 class TestBE_restricted(unittest.TestCase):
     # TODO: Add test against known values (molecular_restrict_test)
     def test_h8_sto3g_ben_trustRegion(self):
         # Test consistency between two QN methods
+        mol = self.get_h8_mol()
+        self.molecular_QN_test(
+            mol,
+            2,
+            "H8 (BE2)",
+            "chemgen",
+            only_chem=False,
+            additional_args=ChemGenArgs(treat_H_different=False),
+        )
+
+    def test_h8_sto3g_ben_LBFGS(self):
+        # Test consistency between QN and L-BFGS
+        mol = self.get_h8_mol()
+        self.molecular_consistency_test(
+            mol,
+            2,
+            "H8 (BE2)",
+            "chemgen",
+            dict(method="QN"),
+            dict(method="LBFGS"),
+            additional_args=ChemGenArgs(treat_H_different=False),
+        )
+
+    def test_h8_sto3g_ben_probe_steps(self):
+        # Test consistency between optimizations with and without
+        # energies in the optimization steps
+        Ebes = []
+        for probe_steps in (False, True):
+            mybe = self.get_h8_BE()
+            be_ = self.get_BEOPT(
+                mybe, array(mybe.pot, dtype=float64), probe_steps=probe_steps
+            )
+            be_.optimize("QN", J0=mybe.get_be_error_jacobian())
+            Ebes.append(be_.Ebe)
+        self.assertAlmostEqual(Ebes[0][0], Ebes[1][0], delta=1e-8)
+        for e_ref, e_probe in zip(Ebes[0][1], Ebes[1][1]):
+            self.assertAlmostEqual(e_ref, e_probe, delta=1e-8)
+
+    def test_h8_sto3g_ben_FD_jacobian(self):
+        # Test consistency between the HF and the (parallel) finite-difference
+        # initial Jacobian
+        mol = self.get_h8_mol()
+        self.molecular_consistency_test(
+            mol,
+            2,
+            "H8 (BE2)",
+            "chemgen",
+            dict(method="QN", jac_solver="HF"),
+            dict(method="QN", jac_solver="FD", nproc=2, ompnum=1),
+            additional_args=ChemGenArgs(treat_H_different=False),
+        )
+
+    def test_h8_sto3g_unsupported_method(self):
+        # An unknown optimization method raises instead of exiting
+        mybe = self.get_h8_BE()
+        with self.assertRaises(ValueError):
+            mybe.optimize(solver="CCSD", method="Newton")
+
+    def test_h8_sto3g_LBFGS_unsupported_options(self):
+        # L-BFGS rejects the QN-only options before solving any fragment
+        mybe = self.get_h8_BE()
+        with self.assertRaises(ValueError):
+            mybe.optimize(solver="CCSD", method="LBFGS", trust_region=True)
+        with self.assertRaises(ValueError):
+            mybe.optimize(solver="CCSD", method="LBFGS", jac_solver="FD")
+
+    def test_h8_sto3g_fragment_mask(self):
+        # Re-solving only the fragment whose potentials changed gives the same
+        # error vector and energy as re-solving all fragments
+        mybe1 = self.get_h8_BE()
+        mybe2 = self.get_h8_BE()
+        x0 = array(mybe1.pot, dtype=float64)
+        x1 = x0.copy()
+        fobj = mybe1.Fobjs[0]
+        x1[fobj.udim : fobj.set_udim(fobj.udim)] += 1.0e-2
+
+        be1 = self.get_BEOPT(mybe1, x0)
+        be1.objfunc(x0)
+        self.assertEqual(
+            be1._get_fragment_mask(x1),
+            [True] + [False] * (len(mybe1.Fobjs) - 1),
+        )
+        errvec_masked = be1.objfunc(x1)
+
+        be2 = self.get_BEOPT(mybe2, x1)
+        errvec_full = be2.objfunc(x1)
+
+        self.assertTrue(abs(errvec_masked - errvec_full).max() < 1e-8)
+        self.assertAlmostEqual(be1.err, be2.err, delta=1e-8)
+        self.assertAlmostEqual(be1.Ebe[0], be2.Ebe[0], delta=1e-8)
+
+    def test_h8_sto3g_precomputed_f0(self):
+        # Resuming from a precomputed (err, errvec, Ebe), with errvec as a list,
+        # converges to the same energy
+        mybe1 = self.get_h8_BE()
+        mybe1.optimize(solver="CCSD", method="QN")
+
+        mybe2 = self.get_h8_BE()
+        x0 = array(mybe2.pot, dtype=float64)
+        be_ = self.get_BEOPT(mybe2, x0)
+        errvec0 = be_.objfunc(x0)
+        f0 = (be_.err, list(errvec0), be_.Ebe)
+
+        be_ = self.get_BEOPT(mybe2, x0)
+        be_.optimize("QN", J0=mybe2.get_be_error_jacobian(), f0=f0)
+        self.assertAlmostEqual(mybe1.ebe_tot, be_.Ebe[0] + mybe2.ebe_hf, delta=1e-6)
+
+    def test_h8_sto3g_objfunc_cache(self):
+        # Bit-identical potentials are not solved again,
+        # until they are evicted from the cache
+        mybe = self.get_h8_BE()
+        x0 = array(mybe.pot, dtype=float64)
+        be_ = self.get_BEOPT(mybe, x0, enable_cache=True)
+        be_._be_call = Mock(wraps=be_._get_be_call())
+
+        errvec0 = be_.objfunc(x0)
+        err0, Ebe0 = be_.err, be_.Ebe
+        be_.objfunc(x0 + 1.0e-3)
+        self.assertEqual(be_._be_call.call_count, 2)
+
+        errvec = be_.objfunc(x0.copy())
+        self.assertEqual(be_._be_call.call_count, 2)
+        self.assertTrue((errvec == errvec0).all())
+        self.assertEqual(be_.err, err0)
+        self.assertEqual(be_.Ebe, Ebe0)
+
+        for i in range(_OBJFUNC_CACHE_SIZE):
+            be_.objfunc(x0 + (i + 2) * 1.0e-3)
+        self.assertEqual(len(be_._cache), _OBJFUNC_CACHE_SIZE)
+        be_.objfunc(x0)
+        self.assertEqual(be_._be_call.call_count, _OBJFUNC_CACHE_SIZE + 3)
+
+    def test_h8_sto3g_solve_error(self):
+        # The vectorized error vector agrees with the explicit edge/center loop
+        mybe = self.get_h8_BE()
+        rng = default_rng(42)
+        for fobj in mybe.Fobjs:
+            rdm1 = rng.random((fobj.nao, fobj.nao))
+            fobj._rdm1 = rdm1 + rdm1.T
+        err, errvec = solve_error(mybe.Fobjs, mybe.Nocc)
+        err_ref, errvec_ref = solve_error_reference(mybe.Fobjs, mybe.Nocc)
+        self.assertEqual(errvec.shape, errvec_ref.shape)
+        self.assertTrue(abs(errvec - errvec_ref).max() < 1e-12)
+        self.assertAlmostEqual(err, err_ref, delta=1e-12)
+
+    def get_h8_mol(self):
         mol = gto.M()
         mol.atom = [["H", (0.0, 0.0, i)] for i in range(7)]
         mol.atom.append(["H", (0.0, 0.0, 4.2)])
@@ -24,14 +175,31 @@ class TestBE_restricted(unittest.TestCase):
         mol.charge = 0.0
         mol.spin = 0.0
         mol.build()
-        self.molecular_QN_test(
-            mol,
-            2,
-            "H8 (BE2)",
-            "chemgen",
-            only_chem=False,
+        return mol
+
+    def get_h8_BE(self):
+        mol = self.get_h8_mol()
+        mf = scf.RHF(mol)
+        mf.kernel()
+        fobj = fragmentate(
+            frag_type="chemgen",
+            n_BE=2,
+            mol=mol,
             additional_args=ChemGenArgs(treat_H_different=False),
         )
+        return BE(mf, fobj)
+
+    def get_BEOPT(self, mybe, pot, **kwargs):
+        return BEOPT(
+            pot,
+            mybe.Fobjs,
+            mybe.Nocc,
+            mybe.enuc,
+            scratch_dir=mybe.scratch_dir,
+            solver="CCSD",
+            ebe_hf=mybe.ebe_hf,
+            **kwargs,
+        )
 
     def molecular_QN_test(
         self,
@@ -69,6 +237,76 @@ class TestBE_restricted(unittest.TestCase):
             delta=delta,
         )
 
+    def molecular_consistency_test(
+        self,
+        mol,
+        n_BE,
+        test_name,
+        frag_type,
+        optimize_args_1,
+        optimize_args_2,
+        delta=1e-6,
+        only_chem=False,
+        additional_args=None,
+    ):
+        mf = scf.RHF(mol)
+        mf.max_cycle = 100
+        mf.kernel()
+        fobj = fragmentate(
+            frag_type=frag_type,
+            n_BE=n_BE,
+            mol=mol,
+            additional_args=additional_args,
+        )
+        mybe1 = BE(mf, fobj)
+        mybe1.optimize(solver="CCSD", only_chem=only_chem, **optimize_args_1)
+        mybe2 = BE(mf, fobj)
+        mybe2.optimize(solver="CCSD", only_chem=only_chem, **optimize_args_2)
+        self.assertAlmostEqual(
+            mybe1.ebe_tot,
+            mybe2.ebe_tot,
+            msg="BE Correlation Energy (DM) for "
+            + test_name
+            + f" does not return comparable results for {optimize_args_1}"
+            + f" and {optimize_args_2}!",
+            delta=delta,
+        )
+
+
+def solve_error_reference(Fobjs, Nocc):
+    """Density matching error, as computed by the loops that
+    :func:`quemb.molbe.solver.solve_error` replaced."""
+    err_edge = []
+    err_chempot = 0.0
+    for fobj in Fobjs:
+        for edge in fobj.relAO_per_edge:
+            for j_ in range(len(edge)):
+                for k_ in range(len(edge)):
+                    if j_ > k_:
+                        continue
+                    err_edge.append(fobj._rdm1[edge[j_], edge[k_]])
+        for i in fobj.weight_and_relAO_per_center[1]:
+            err_chempot += fobj._rdm1[i, i]
+    err_chempot /= Fobjs[0].unitcell_nkpt
+    err_edge.append(err_chempot)
+
+    err_cen = []
+    for fobj in Fobjs:
+        for cindx, cens in enumerate(fobj.relAO_in_ref_per_edge):
+            for j_ in range(len(cens)):
+                for k_ in range(len(cens)):
+                    if j_ > k_:
+                        continue
+                    err_cen.append(
+                        Fobjs[fobj.ref_frag_idx_per_edge[cindx]]._rdm1[
+                            cens[j_], cens[k_]
+                        ]
+                    )
+    err_cen.append(Nocc)
+
+    err_vec = array(err_edge) - array(err_cen)
+    return mean(err_vec * err_vec) ** 0.5, err_vec
+
 
 if __name__ == "__main__":
     unittest.main()
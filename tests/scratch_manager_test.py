@@ -1,14 +1,20 @@
 import os
 from pathlib import Path
-from tempfile import mkdtemp
 
-from pytest import raises
+from pytest import fixture, raises
 
 from quemb.shared.manage_scratch import WorkDir
 
 
-def test_already_created() -> None:
-    my_tmp = Path(mkdtemp())
+@fixture(scope="module")
+def tmp_root(tmp_path_factory) -> Path:
+    """Shared root for the test directories, cleaned up by pytest."""
+    return tmp_path_factory.mktemp("scratch_tests")
+
+
+def test_already_created(tmp_root: Path) -> None:
+    my_tmp = tmp_root / "sub_0"
+    my_tmp.mkdir()
     assert my_tmp.exists()
 
     scratch = WorkDir(my_tmp)
@@ -20,8 +26,9 @@ def test_already_created() -> None:
         scratch.cleanup()
 
 
-def test_keep_upon_error() -> None:
-    my_tmp = Path(mkdtemp())
+def test_keep_upon_error(tmp_root: Path) -> None:
+    my_tmp = tmp_root / "sub_1"
+    my_tmp.mkdir()
     assert my_tmp.exists()
 
     with raises(ValueError):
@@ -34,8 +41,9 @@ def test_keep_upon_error() -> None:
     assert not my_tmp.exists()
 
 
-def test_context_manager() -> None:
-    my_tmp = Path(mkdtemp())
+def test_context_manager(tmp_root: Path) -> None:
+    my_tmp = tmp_root / "sub_2"
+    my_tmp.mkdir()
     assert my_tmp.exists()
 
     with WorkDir(my_tmp):
@@ -0,0 +1,15 @@
+from quemb.molbe.be_parallel import _get_worker_cores
+
+
+def test_worker_cores() -> None:
+    available = {9, 2, 4, 3, 8, 5}
+    assert _get_worker_cores(0, 2, available) == [2, 3]
+    assert _get_worker_cores(1, 2, available) == [4, 5]
+    assert _get_worker_cores(2, 2, available) == [8, 9]
+
+
+def test_worker_cores_not_enough() -> None:
+    available = range(6)
+    assert _get_worker_cores(1, 3, available) == [3, 4, 5]
+    assert _get_worker_cores(2, 3, available) is None
+    assert _get_worker_cores(0, 8, available) is None
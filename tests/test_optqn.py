@@ -0,0 +1,51 @@
+import numpy as np
+
+from quemb.shared.external.optqn import _broyden_update, _get_Bnfn
+
+
+def test_broyden_update() -> None:
+    rng = np.random.default_rng(42)
+    n = 6
+    Binv = rng.random((n, n)) + n * np.eye(n)
+    dx, df = rng.random(n), rng.random(n)
+    expected = Binv + np.outer(dx - Binv @ df, dx @ Binv) / (dx @ Binv @ df)
+
+    # C-contiguous, updated by dger
+    Binv_c = Binv.copy()
+    _broyden_update(Binv_c, dx, df)
+    assert np.allclose(Binv_c, expected)
+
+    # Fortran-ordered, updated by the outer product
+    Binv_f = np.asfortranarray(Binv)
+    _broyden_update(Binv_f, dx, df)
+    assert np.allclose(Binv_f, expected)
+
+
+def _get_Bnfn_reference(us, dxs, vs, n):
+    """The list-based recursion that :func:`_get_Bnfn` replaced"""
+    vs_ = [vs[n - i - 1] for i in range(n)]
+    for i in range(1, n + 1):
+        un_ = us[i - 1]
+        dxn_ = dxs[i - 1]
+        vps = [None] * (n - i + 1)
+        for j in range(n - i + 1):
+            a = vs_[j]
+            b = vs_[n - i] - un_
+            vps[j] = a + (dxn_ @ a) / (dxn_ @ b) * (dxn_ - b)
+        vs_ = vps
+    return vs_[0]
+
+
+def test_get_Bnfn() -> None:
+    rng = np.random.default_rng(42)
+    dim, max_space = 7, 12
+    us = rng.random((max_space, dim))
+    dxs = rng.random((max_space, dim))
+    vs = rng.random((max_space, dim))
+    vs_before = vs.copy()
+    for n in (1, 2, 5, 11):
+        assert np.allclose(
+            _get_Bnfn(us, dxs, vs, n), _get_Bnfn_reference(us, dxs, vs, n)
+        )
+    # The work array is a copy, vs is not modified
+    assert np.array_equal(vs, vs_before)